@@ -1,4 +1,7 @@
-ACTUATORS = {
+from types import MappingProxyType
+
+# Read-only actuator name -> actuator test ID table
+ACTUATORS = MappingProxyType({
     "Pump Motor Relay": 0x0022,
     "Inlet Valve FL": 0x0030,
     "Inlet Valve FR": 0x0034,
@@ -16,4 +19,4 @@ ACTUATORS = {
     "ESC Safety Lamp": 0x0004,
     "EBD Safety Lamp": 0x000E,
     # add more from your diagnostic doc here...
-}
+})
@@ -1,19 +1,33 @@
 # can_control.py
-import os
+import subprocess
 import time
 
-def bring_up(channel="can0", bitrate=500000):
+_QUIET = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+
+def _link_is_up(channel):
+    """Return True once `ip -br link show` reports the interface as UP."""
+    out = subprocess.run(["ip", "-br", "link", "show", channel],
+                         capture_output=True, text=True, check=False).stdout.split()
+    # e.g. "can0  UP  <NOARP,UP,LOWER_UP,ECHO>"
+    return len(out) >= 3 and "UP" in out[2].strip("<>").split(",")
+
+def bring_up(channel="can0", bitrate=500000, timeout=0.05):
     """
     Bring up CAN interface with given bitrate.
     Requires passwordless sudo or proper permissions.
     """
-    os.system(f"sudo ip link set {channel} down >/dev/null 2>&1 || true")
-    os.system(f"sudo ip link set {channel} type can bitrate {bitrate} >/dev/null 2>&1 || true")
-    os.system(f"sudo ip link set {channel} up")
-    time.sleep(0.05)
+    subprocess.run(["sudo", "ip", "link", "set", channel, "down"], check=False, **_QUIET)
+    subprocess.run(["sudo", "ip", "link", "set", channel, "type", "can",
+                    "bitrate", str(bitrate)], check=False, **_QUIET)
+    subprocess.run(["sudo", "ip", "link", "set", channel, "up"], check=True)
+
+    # Wait (at most `timeout`) for the link to report UP instead of a fixed sleep
+    deadline = time.monotonic() + timeout
+    while not _link_is_up(channel) and time.monotonic() < deadline:
+        time.sleep(0.005)
     print(f"✅ {channel} is UP at {bitrate} bps")
 
 def bring_down(channel="can0"):
     """Bring down CAN interface safely."""
-    os.system(f"sudo ip link set {channel} down >/dev/null 2>&1 || true")
+    subprocess.run(["sudo", "ip", "link", "set", channel, "down"], check=False, **_QUIET)
     print(f"⏹️ {channel} is DOWN")
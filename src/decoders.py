@@ -11,18 +11,261 @@
 #   بایت‌های خام به مقادیر قابل‌فهم برای انسان.
 # ============================================================
 
+import functools
+import struct
+from enum import IntFlag
+
 from utils import hexdump
 
 
+def _memoize(func):
+    """
+    Memoize a decoder that returns an immutable value (str / int) on the
+    raw payload bytes: most of these DIDs repeat the same answer every poll.
+    The payload view is copied to bytes here only, to serve as the key.
+
+    کش نتایج برای شناسه‌هایی که مقدارشان در هر بار خواندن تکرار می‌شود
+    """
+    cached = functools.lru_cache(maxsize=64)(func)
+
+    @functools.wraps(func)
+    def wrapper(payload, *args, **kwargs):
+        return cached(bytes(payload), *args, **kwargs)
+
+    wrapper.cache_info = cached.cache_info
+    return wrapper
+
+
+# ============================================================
+# --- F186 : Diagnostic Session ---
+# ============================================================
+@_memoize
+def _decode_f186(payload):
+    if len(payload) >= 1:
+        session_map = {
+            0x01: "Default Session",
+            0x03: "Extended Session"
+        }
+        return session_map.get(payload[0], f"0x{payload[0]:02X}")
+    return None
+
+
+# ============================================================
+# --- ASCII DIDs : Spare Part Number, Supplier ID, VIN,
+#     Software / Hardware Version ---
+# ============================================================
+# DID -> field length in bytes (None = whole payload)
+_ASCII_DIDS = {
+    0xF187: 8,     # Spare Part Number
+    0xF18A: 10,    # System Supplier ID
+    0xF195: 8,     # Software Version
+    0xF1A4: 10,    # Hardware Version
+}
+
+
+# Fixed-width fields are padded with NUL, spaces or 0xFF
+_ASCII_PADDING = b"\x00\t\n\x0b\x0c\r \xff"
+
+
+@_memoize
+def _decode_ascii(payload, n):
+    # Strip the padding on the bytes before decoding; errors="ignore" cannot
+    # raise, so no hexdump fallback is needed. The final rstrip() catches
+    # whitespace left in front of a dropped non-ASCII byte (short by now)
+    field = payload if n is None else payload[:n]
+    return field.rstrip(_ASCII_PADDING).decode("ascii", "ignore").rstrip()
+
+
+@_memoize
+def _decode_vin(payload):
+    # Whole payload; unlike the other ASCII fields the VIN is stripped at both ends
+    return _decode_ascii(payload, None).lstrip()
+
+
+# ============================================================
+# --- F18B : Manufacturing Date (BCD format) ---
+# ============================================================
+@_memoize
+def _decode_f18b(payload):
+    if len(payload) >= 4:
+        # Convert all four BCD bytes at once: (high nibble * 10) + low nibble
+        # per byte; each result (<= 165) still fits in its own byte lane
+        w = int.from_bytes(payload[:4], "big")
+        s = ((w & 0xF0F0F0F0) >> 4) * 10 + (w & 0x0F0F0F0F)
+        year = (s >> 24) * 100 + ((s >> 16) & 0xFF)
+        month = (s >> 8) & 0xFF
+        day = s & 0xFF
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    return hexdump(payload)
+
+
+# ============================================================
+# --- FD00 : Wheel & Vehicle Speeds ---
+# ============================================================
+_FD00_KEYS = ("VehicleSpeed_kmh", "WheelFL_kmh", "WheelFR_kmh", "WheelRL_kmh", "WheelRR_kmh")
+_FD00_UNPACK = struct.Struct(">5H").unpack_from
+
+
+def _decode_fd00(payload):
+    if len(payload) < 10:
+        return None
+
+    # Five big-endian 16-bit speeds converted to km/h; raw values >= 0xFF00
+    # are invalid markers
+    # تبدیل مقادیر خام به سرعت کیلومتر بر ساعت
+    # Five values are too few for numpy to pay off; one C-level unpack instead
+    speeds = [None if raw >= 0xFF00 else raw * 0.05625 for raw in _FD00_UNPACK(payload)]
+    return dict(zip(_FD00_KEYS, speeds))
+
+
+# ============================================================
+# --- FD01 : Input Data (Battery, Brake) ---
+# ============================================================
+def _decode_fd01(payload):
+    if len(payload) >= 2:
+        battery_v = payload[0] * 0.08
+        brake_on = (payload[1] == 0x01)
+        return {"BatteryV": battery_v, "BrakeLight": brake_on}
+    return None
+
+
+# ============================================================
+# --- FD02 : Actuation State ---
+# ============================================================
+class ValveFlags(IntFlag):
+    """
+    Packed FD02 actuation state: byte 5 in bits 0-7, low nibble of
+    byte 6 in bits 8-11, valve relay and pump motor in bits 12-13.
+
+    وضعیت شیرها، رله و پمپ به صورت بیت‌های یک عدد صحیح
+    """
+    EVFL = 1 << 0
+    AVFL = 1 << 1
+    EVFR = 1 << 2
+    AVFR = 1 << 3
+    EVRL = 1 << 4
+    AVRL = 1 << 5
+    EVRR = 1 << 6
+    AVRR = 1 << 7
+    USV1 = 1 << 8
+    USV2 = 1 << 9
+    HSV1 = 1 << 10
+    HSV2 = 1 << 11
+    RELAY = 1 << 12
+    PUMP = 1 << 13
+
+
+def _decode_fd02(payload):
+    if len(payload) >= 4:
+        flags = payload[2] | ((payload[3] & 0x0F) << 8)
+        if payload[0] == 0x01:
+            flags |= ValveFlags.RELAY
+        if payload[1] == 0x01:
+            flags |= ValveFlags.PUMP
+        return {"ValveFlags": ValveFlags(flags)}
+    return {"Raw": hexdump(payload)}
+
+
+# ============================================================
+# --- FD03 / FD04 : Filling-in Status / EOL Status ---
+# ============================================================
+_COMPLETION_MAP = {
+    0x00: "Not completed",
+    0xAA: "Completed OK",
+    0xEE: "Completed Not OK",
+    0xFF: "Delivery State"
+}
+
+
+@_memoize
+def _decode_completion(payload):
+    if len(payload) >= 1:
+        code = payload[0]
+        return _COMPLETION_MAP.get(code, f"0x{code:02X}")
+    return None
+
+
+# ============================================================
+# --- FD05 : System Sensors (Pressure, Steering, Yaw, Accel) ---
+# ============================================================
+_FD05_KEYS = ("MasterCylinder_bar", "Steering_deg", "Yaw_rad_s", "Lateral_m_s2", "Longitudinal_m_s2")
+_FD05_RESOLUTION = (0.0153, 0.1, 0.00213, 0.02712, 0.02712)
+_FD05_UNPACK = struct.Struct(">5h").unpack_from
+
+
+def _decode_fd05(payload):
+    if len(payload) < 10:
+        return None
+
+    # Five signed (two's complement) 16-bit sensors; 0x7FFF marks invalid
+    # تفسیر داده‌های سنسور با درنظر گرفتن علامت و مقدار نامعتبر
+    values = [None if raw == 0x7FFF else raw * res
+              for raw, res in zip(_FD05_UNPACK(payload), _FD05_RESOLUTION)]
+    return dict(zip(_FD05_KEYS, values))
+
+
+# ============================================================
+# --- FD06 : Variant Code ---
+# ============================================================
+@_memoize
+def _decode_fd06(payload):
+    if len(payload) >= 1:
+        return payload[0]
+    return None
+
+
+# ============================================================
+# DID -> decoder dispatch table (built once at import)
+# جدول انتخاب تابع تفسیر بر اساس شناسه داده
+# ============================================================
+_DECODERS = {
+    0xF186: _decode_f186,
+    0xF18B: _decode_f18b,
+    0xF190: _decode_vin,
+    **{did: functools.partial(_decode_ascii, n=n) for did, n in _ASCII_DIDS.items()},
+    0xFD00: _decode_fd00,
+    0xFD01: _decode_fd01,
+    0xFD02: _decode_fd02,
+    0xFD03: _decode_completion,
+    0xFD04: _decode_completion,
+    0xFD05: _decode_fd05,
+    0xFD06: _decode_fd06,
+}
+
+
+# ============================================================
+# Data length of each DID record, used to split multi-DID
+# ReadDataByIdentifier responses (62 DID1 data1 DID2 data2 ...)
+# طول دادهٔ هر شناسه برای جداسازی پاسخ‌های چندشناسه‌ای
+# ============================================================
+DID_LENGTHS = {
+    0xF186: 1,
+    0xF187: 8,
+    0xF18A: 10,
+    0xF18B: 4,
+    0xF190: 17,
+    0xF195: 8,
+    0xF1A4: 10,
+    0xFD00: 10,
+    0xFD01: 2,
+    0xFD02: 4,
+    0xFD03: 1,
+    0xFD04: 1,
+    0xFD05: 10,
+    0xFD06: 1,
+}
+
+
 def decode_value(did, data):
     """
     Decode payload for a given DID from ReadDataByIdentifier (0x22) response.
 
     did : int - Data Identifier (e.g., 0xFD00)
-    data: bytes - Full UDS response including SID (e.g. b'\x62\xFD\x00...')
+    data: bytes-like - Full UDS response including SID (e.g. b'\x62\xFD\x00...')
 
     Returns:
-        Decoded value as string, number, or dict.
+        Decoded value as string, number, or dict. Multi-signal DIDs
+        (FD00, FD01, FD02, FD05) always decode to a dict or None.
 
     پارامترها:
         did : شناسه داده
@@ -31,212 +274,10 @@ def decode_value(did, data):
     if not data or len(data) < 3:
         return None
 
-    payload = data[3:]  # strip SID + DID
-
-    # ============================================================
-    # --- F186 : Diagnostic Session ---
-    # ============================================================
-    if did == 0xF186:
-        if len(payload) >= 1:
-            session_map = {
-                0x01: "Default Session",
-                0x03: "Extended Session"
-            }
-            return session_map.get(payload[0], f"0x{payload[0]:02X}")
-        return None
+    payload = memoryview(data)[3:]  # strip SID + DID without copying
 
-    # ============================================================
-    # --- F187 : Spare Part Number (ASCII, 8 bytes) ---
-    # ============================================================
-    if did == 0xF187:
-        try:
-            return payload[:8].decode("ascii", errors="ignore").rstrip()
-        except Exception:
-            return hexdump(payload)
-
-    # ============================================================
-    # --- F18A : System Supplier ID (ASCII, 10 bytes) ---
-    # ============================================================
-    if did == 0xF18A:
-        try:
-            return payload[:10].decode("ascii", errors="ignore").rstrip()
-        except Exception:
-            return hexdump(payload)
-
-    # ============================================================
-    # --- F18B : Manufacturing Date (BCD format) ---
-    # ============================================================
-    if did == 0xF18B:
-        if len(payload) >= 4:
-            def bcd_to_int(b): return ((b >> 4) * 10) + (b & 0x0F)
-            year = bcd_to_int(payload[0]) * 100 + bcd_to_int(payload[1])
-            month = bcd_to_int(payload[2])
-            day = bcd_to_int(payload[3])
-            return f"{year:04d}-{month:02d}-{day:02d}"
+    handler = _DECODERS.get(did)
+    if handler is None:
+        # Default / Fallback
         return hexdump(payload)
-
-    # ============================================================
-    # --- F190 : VIN (ASCII or structured) ---
-    # ============================================================
-    if did == 0xF190:
-        try:
-            return payload.decode("ascii", errors="ignore").strip()
-        except Exception:
-            return hexdump(payload)
-
-    # ============================================================
-    # --- F195 : Software Version ---
-    # ============================================================
-    if did == 0xF195:
-        try:
-            return payload[:8].decode("ascii", errors="ignore").rstrip()
-        except Exception:
-            return hexdump(payload)
-
-    # ============================================================
-    # --- F1A4 : Hardware Version ---
-    # ============================================================
-    if did == 0xF1A4:
-        try:
-            return payload[:10].decode("ascii", errors="ignore").rstrip()
-        except Exception:
-            return hexdump(payload)
-
-    # ============================================================
-    # --- FD00 : Wheel & Vehicle Speeds ---
-    # ============================================================
-    if did == 0xFD00:
-        if len(payload) < 10:
-            return None
-
-        def to_speed(raw):
-            # Convert raw 16-bit to km/h, ignore invalid markers >= 0xFF00
-            # تبدیل مقادیر خام به سرعت کیلومتر بر ساعت
-            if raw >= 0xFF00:
-                return None
-            return raw * 0.05625
-
-        vehicle_raw = int.from_bytes(payload[0:2], "big")
-        fl_raw = int.from_bytes(payload[2:4], "big")
-        fr_raw = int.from_bytes(payload[4:6], "big")
-        rl_raw = int.from_bytes(payload[6:8], "big")
-        rr_raw = int.from_bytes(payload[8:10], "big")
-
-        return {
-            "VehicleSpeed_kmh": to_speed(vehicle_raw),
-            "WheelFL_kmh": to_speed(fl_raw),
-            "WheelFR_kmh": to_speed(fr_raw),
-            "WheelRL_kmh": to_speed(rl_raw),
-            "WheelRR_kmh": to_speed(rr_raw),
-        }
-
-    # ============================================================
-    # --- FD01 : Input Data (Battery, Brake) ---
-    # ============================================================
-    if did == 0xFD01:
-        if len(payload) >= 2:
-            battery_v = payload[0] * 0.08
-            brake_on = (payload[1] == 0x01)
-            return {"BatteryV": battery_v, "BrakeLight": brake_on}
-        return None
-
-    # ============================================================
-    # --- FD02 : Actuation State ---
-    # ============================================================
-    if did == 0xFD02:
-        if len(payload) >= 4:
-            relay_status = "ON" if payload[0] == 0x01 else "OFF"
-            pump_status = "ON" if payload[1] == 0x01 else "OFF"
-            b5, b6 = payload[2], payload[3]
-            valves = {
-                "EVFL": bool(b5 & 0x01),
-                "AVFL": bool(b5 & 0x02),
-                "EVFR": bool(b5 & 0x04),
-                "AVFR": bool(b5 & 0x08),
-                "EVRL": bool(b5 & 0x10),
-                "AVRL": bool(b5 & 0x20),
-                "EVRR": bool(b5 & 0x40),
-                "AVRR": bool(b5 & 0x80),
-                "USV1": bool(b6 & 0x01),
-                "USV2": bool(b6 & 0x02),
-                "HSV1": bool(b6 & 0x04),
-                "HSV2": bool(b6 & 0x08),
-            }
-            result = {"ValveRelay": relay_status, "PumpMotor": pump_status}
-            result.update(valves)
-            return result
-        return {"Raw": hexdump(payload)}
-
-    # ============================================================
-    # --- FD03 : Filling-in Status ---
-    # ============================================================
-    if did == 0xFD03:
-        if len(payload) >= 1:
-            code = payload[0]
-            mapping = {
-                0x00: "Not completed",
-                0xAA: "Completed OK",
-                0xEE: "Completed Not OK",
-                0xFF: "Delivery State"
-            }
-            return mapping.get(code, f"0x{code:02X}")
-        return None
-
-    # ============================================================
-    # --- FD04 : EOL Status ---
-    # ============================================================
-    if did == 0xFD04:
-        if len(payload) >= 1:
-            code = payload[0]
-            mapping = {
-                0x00: "Not completed",
-                0xAA: "Completed OK",
-                0xEE: "Completed Not OK",
-                0xFF: "Delivery State"
-            }
-            return mapping.get(code, f"0x{code:02X}")
-        return None
-
-    # ============================================================
-    # --- FD05 : System Sensors (Pressure, Steering, Yaw, Accel) ---
-    # ============================================================
-    if did == 0xFD05:
-        if len(payload) < 10:
-            return None
-
-        def decode_sensor(raw, resolution):
-            """Two's complement & invalid handling."""
-            # تفسیر داده‌های سنسور با درنظر گرفتن علامت و مقدار نامعتبر
-            if raw == 0x7FFF:
-                return None
-            if raw < 0x8000:
-                return raw * resolution
-            neg = raw - 0x10000
-            return neg * resolution
-
-        mcp_raw = int.from_bytes(payload[0:2], "big")
-        steer_raw = int.from_bytes(payload[2:4], "big")
-        yaw_raw = int.from_bytes(payload[4:6], "big")
-        lat_raw = int.from_bytes(payload[6:8], "big")
-        lon_raw = int.from_bytes(payload[8:10], "big")
-
-        return {
-            "MasterCylinder_bar": decode_sensor(mcp_raw, 0.0153),
-            "Steering_deg": decode_sensor(steer_raw, 0.1),
-            "Yaw_rad_s": decode_sensor(yaw_raw, 0.00213),
-            "Lateral_m_s2": decode_sensor(lat_raw, 0.02712),
-            "Longitudinal_m_s2": decode_sensor(lon_raw, 0.02712)
-        }
-
-    # ============================================================
-    # --- FD06 : Variant Code ---
-    # ============================================================
-    if did == 0xFD06:
-        if len(payload) >= 1:
-            return payload[0]
-        return None
-
-    # ============================================================
-    # Default / Fallback
-    # ============================================================
-    return hexdump(payload)
+    return handler(payload)
@@ -12,82 +12,205 @@
 # ============================================================
 
 import sys
+import logging
 import time
+from copy import copy
+from dataclasses import dataclass
+from types import MappingProxyType
+from functools import lru_cache, partial
+from importlib.util import find_spec
 from PyQt5 import uic, QtGui
 from PyQt5.QtGui import QFont, QColor, QBrush
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QTableWidgetItem,
-    QHeaderView, QLabel, QVBoxLayout, QMessageBox
+    QHeaderView, QLabel, QVBoxLayout, QMessageBox, QAbstractItemView
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 from uds_client import UDSClient
 from actuators import ACTUATORS
+from decoders import ValveFlags
+from utils import BYTE_HEX
+import numpy as np
 import pyqtgraph as pg
-from collections import deque
 
 # CAN interface used for communication with the ECU (ای‌سی‌یو)
 CAN_INTERFACE = "can0"
 
+# Render the plots through an OpenGL viewport (needs PyOpenGL). Opt-in,
+# since it changes how the plots are drawn
+USE_OPENGL = False
+
+# Faster curve path building when numba is installed
+if find_spec("numba") is not None:
+    pg.setConfigOption("useNumba", True)
+if USE_OPENGL:
+    pg.setConfigOption("useOpenGL", True)
+
+# Identification DIDs do not change while connected: they are read until
+# they answer once. Measurement DIDs, and the active session (F186, which
+# falls back to default after an ECU reset or S3 timeout), are read on
+# every poll.
+_STATIC_DIDS = (0xF187, 0xF18A, 0xF18B, 0xF190, 0xF195, 0xF1A4)
+_DYNAMIC_DIDS = (0xF186, 0xFD00, 0xFD01, 0xFD02, 0xFD03, 0xFD04, 0xFD05, 0xFD06)
+
+# Monitor value label styles, indexed by the style codes below
+_STYLE_DEFAULT, _STYLE_ON, _STYLE_OFF = range(3)
+_STYLES = (
+    "padding: 2px; border: 1px solid lightgray;",
+    "background-color: lightgreen; padding: 2px;",
+    "background-color: pink; padding: 2px;",
+)
+_ON_TEXT = frozenset({"ON", "1", "TRUE"})
+_OFF_TEXT = frozenset({"OFF", "0", "FALSE"})
+
+
+# ============================================================
+# Monitor Snapshot: latest value of every monitored signal
+# آخرین مقدار تمام سیگنال‌های پایش‌شده
+# ============================================================
+@dataclass(slots=True)
+class MonitorSnapshot:
+    """Decoded monitor signals; None means not (yet) available."""
+    # --- Identification ---
+    session: str | None = None
+    spare_part: str | None = None
+    supplier_id: str | None = None
+    manufacturing_date: str | None = None
+    vin: str | None = None
+    software_version: str | None = None
+    hardware_version: str | None = None
+    # --- Speeds (km/h) ---
+    vehicle_speed: float | None = None
+    wheel_fl: float | None = None
+    wheel_fr: float | None = None
+    wheel_rl: float | None = None
+    wheel_rr: float | None = None
+    # --- Inputs ---
+    battery_v: float | None = None
+    brake_light: bool | None = None
+    # --- Actuation State ---
+    valve_flags: ValveFlags | None = None
+    # --- Statuses ---
+    filling_status: str | None = None
+    eol_status: str | None = None
+    # --- Sensors ---
+    master_cylinder: float | None = None
+    steering: float | None = None
+    yaw_rate: float | None = None
+    lateral_accel: float | None = None
+    longitudinal_accel: float | None = None
+    # --- Variant ---
+    variant_code: int | None = None
+    error: str | None = None
+
+    def update(self, did, decoded):
+        """Store the decoded value of one DID in its field(s)."""
+        attr = _SCALAR_FIELDS.get(did)
+        if attr is not None:
+            setattr(self, attr, decoded)
+            return
+        # Multi-signal DIDs decode to a dict, or None if unavailable
+        if decoded is None:
+            decoded = _EMPTY
+        for key, attr in _SNAPSHOT_FIELDS[did].items():
+            setattr(self, attr, decoded.get(key))
+
+
+# DID -> snapshot field, or decoded dict key -> snapshot field
+_SNAPSHOT_FIELDS = {
+    0xF186: "session",
+    0xF187: "spare_part",
+    0xF18A: "supplier_id",
+    0xF18B: "manufacturing_date",
+    0xF190: "vin",
+    0xF195: "software_version",
+    0xF1A4: "hardware_version",
+    0xFD00: {
+        "VehicleSpeed_kmh": "vehicle_speed",
+        "WheelFL_kmh": "wheel_fl",
+        "WheelFR_kmh": "wheel_fr",
+        "WheelRL_kmh": "wheel_rl",
+        "WheelRR_kmh": "wheel_rr",
+    },
+    0xFD01: {"BatteryV": "battery_v", "BrakeLight": "brake_light"},
+    0xFD02: {"ValveFlags": "valve_flags"},
+    0xFD03: "filling_status",
+    0xFD04: "eol_status",
+    0xFD05: {
+        "MasterCylinder_bar": "master_cylinder",
+        "Steering_deg": "steering",
+        "Yaw_rad_s": "yaw_rate",
+        "Lateral_m_s2": "lateral_accel",
+        "Longitudinal_m_s2": "longitudinal_accel",
+    },
+    0xFD06: "variant_code",
+}
+# Single-value DIDs only, so update() needs no type check per call
+_SCALAR_FIELDS = {did: f for did, f in _SNAPSHOT_FIELDS.items() if isinstance(f, str)}
+_EMPTY = MappingProxyType({})
+
 
 # ============================================================
 # Worker Thread: Periodically Reads ECU Signals
 # نخ کارگر برای خواندن مداوم داده‌های ای‌سی‌یو
 # ============================================================
 class MonitorWorker(QThread):
-    data_signal = pyqtSignal(dict)
+    data_signal = pyqtSignal(object)  # MonitorSnapshot
 
-    def __init__(self, channel=CAN_INTERFACE, delay=0.5):
+    def __init__(self, uds, delay=0.5):
         super().__init__()
-        self.channel = channel
+        self.uds = uds
         self.delay = delay
         self.running = True
 
     def run(self):
         """Main thread loop — reads data periodically."""
-        uds = UDSClient(channel=self.channel)
-        try:
-            if not uds.enter_extended_session() or not uds.security_access():
-                self.data_signal.emit({"error": "Failed to unlock ECU"})
-                return
-
-            # List of Data Identifiers (DIDs) to read
-            dids = [
-                0xF186, 0xF187, 0xF18A, 0xF18B,
-                0xF190, 0xF195, 0xF1A4,
-                0xFD00, 0xFD01, 0xFD02,
-                0xFD03, 0xFD04, 0xFD05,
-                0xFD06,
-            ]
-
-            while self.running:
-                data = {}
-                for did in dids:
-                    val = uds.read_data_by_identifier(did)
-                    decoded = uds.decode_value(did, val) if val is not None else None
-                    if decoded is not None:
-                        name = {
-                            0xF186: "Diagnostic Session",
-                            0xF187: "Spare Part Number",
-                            0xF18A: "System Supplier ID",
-                            0xF18B: "Manufacturing Date",
-                            0xF190: "VIN",
-                            0xF195: "Software Version",
-                            0xF1A4: "Hardware Version",
-                            0xFD00: "Wheel Speeds + Vehicle Speed",
-                            0xFD01: "Input Data",
-                            0xFD02: "Actuation State",
-                            0xFD03: "Filling-in Status",
-                            0xFD04: "EOL Status",
-                            0xFD05: "System Sensors",
-                            0xFD06: "Variant Code",
-                        }[did]
-                        data[name] = decoded
-
-                self.data_signal.emit(data)
-                uds.tester_present()  # keep session alive
-                time.sleep(self.delay)
-        finally:
-            uds.shutdown()
+        uds = self.uds
+        snapshot = MonitorSnapshot()
+        if not uds.ensure_session():
+            snapshot.error = "Failed to unlock ECU"
+            self.data_signal.emit(snapshot)
+            return
+
+        # Fixed-rate schedule: the next poll is due `delay` after the previous
+        # one was due, so read/decode time does not stretch the period
+        next_tick = time.monotonic()
+
+        # Last raw response per DID: unchanged responses are not decoded.
+        # A snapshot is still emitted every poll so the plots keep a
+        # constant sample rate
+        last_raw = {}
+        emitted = copy(snapshot)
+        static_dids = _STATIC_DIDS
+        scratch = bytearray(256)  # responses are unpacked here every poll
+        while self.running:
+            # One multi-DID request per poll (static DIDs join until read)
+            responses = uds.read_multi(static_dids + _DYNAMIC_DIDS, into=scratch)
+            static_dids = tuple(did for did in static_dids if responses[did] is None)
+
+            changed = False
+            for did, val in responses.items():
+                if val == last_raw.get(did):
+                    continue
+                # val may be a view into scratch; keep a copy for comparison
+                last_raw[did] = None if val is None else bytes(val)
+                snapshot.update(did, uds.decode_value(did, val) if val is not None else None)
+                changed = True
+
+            # The snapshot is updated in place; the GUI gets a shallow copy
+            # (all fields are immutable) so it never sees a half-updated poll.
+            # Unchanged polls re-send the previous copy instead of a new one
+            if changed:
+                emitted = copy(snapshot)
+            self.data_signal.emit(emitted)
+            uds.tester_present()  # keep session alive
+
+            next_tick += self.delay
+            pause = next_tick - time.monotonic()
+            if pause > 0:
+                self.msleep(int(pause * 1000))
+            else:
+                next_tick = time.monotonic()  # fell behind; don't burst to catch up
 
     def stop(self):
         """Stop the monitoring thread."""
@@ -95,17 +218,93 @@ class MonitorWorker(QThread):
         self.wait()
 
 
+# ============================================================
+# Worker Threads: One-shot UDS Jobs (actuators, DTCs, calibration)
+# نخ‌های کارگر برای فرمان‌های یک‌باره، تا رابط کاربر قفل نشود
+# ============================================================
+class UDSJobWorker(QThread):
+    """Run `job(uds)` on an unlocked UDS session, off the GUI thread."""
+    result = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, job, uds=None):
+        super().__init__()
+        self.job = job
+        self.uds = uds  # shared client, set by DiagnosticGUI._start_job
+
+    def run(self):
+        try:
+            self.uds.ensure_session()
+            self.result.emit(self.job(self.uds))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class ActuatorSweepWorker(UDSJobWorker):
+    """EOL sweep: pulse every actuator in turn; result is True if all passed."""
+    progress = pyqtSignal(int, str, bool)  # row, actuator name, passed
+
+    def __init__(self, uds=None):
+        super().__init__(self._sweep, uds)
+
+    def _sweep(self, uds):
+        all_passed = True
+        for row, (name, aid) in enumerate(ACTUATORS.items()):
+            resp = uds.actuator_test(aid, on=True, time_ms=1000)
+            time.sleep(1.2)
+            uds.actuator_test(aid, on=False, time_ms=1000)
+            time.sleep(0.2)
+
+            passed = bool(resp)
+            self.progress.emit(row, name, passed)
+            all_passed = all_passed and passed
+        return all_passed
+
+
+@lru_cache(maxsize=4)
+def _logo_pixmap(size=None):
+    """Application logo, loaded once and scaled to `size` x `size` (cached)."""
+    if size is None:
+        return QtGui.QPixmap("./assets/logo.png")
+    return _logo_pixmap().scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def _configure_table(table):
+    """No sorting and fixed-height rows, so bulk fills do no per-item layout."""
+    table.setSortingEnabled(False)
+    table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    table.verticalHeader().setDefaultSectionSize(24)
+    table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+
+
+def _pulse_actuator(uds, actuator_id):
+    """Switch one actuator on for ~1 s, then off."""
+    uds.actuator_test(actuator_id, on=True, time_ms=1000)
+    time.sleep(1.2)
+    uds.actuator_test(actuator_id, on=False, time_ms=1000)
+
+
 # ============================================================
 # Main GUI Class
 # کلاس اصلی رابط کاربر گرافیکی
 # ============================================================
 class DiagnosticGUI(QWidget):
+    # Pass / fail cell backgrounds (shared, never modified)
+    _BRUSH_OK = QBrush(QColor(200, 255, 200))
+    _BRUSH_FAIL = QBrush(QColor(255, 200, 200))
+
     def __init__(self):
         super().__init__()
         uic.loadUi("./ui/HES_gui.ui", self)
 
+        # Summary row font: bold, double the default size. Built here rather
+        # than at class level since the default font needs the QApplication
+        self._summary_font = QFont()
+        self._summary_font.setBold(True)
+        self._summary_font.setPointSize(self._summary_font.pointSize() * 2)
+
         # ---------- Basic UI Setup ----------
-        self.setWindowIcon(QtGui.QIcon("./assets/logo.png"))
+        self.setWindowIcon(QtGui.QIcon(_logo_pixmap()))
 
         # Populate actuator dropdown
         self.actuator_select.clear()
@@ -134,6 +333,9 @@ class DiagnosticGUI(QWidget):
         self.btn_read_dtcs.clicked.connect(self.read_dtcs)
         self.btn_clear_dtcs.clicked.connect(self.clear_dtcs)
 
+        # Verbose checkbox: log every UDS request/response (DEBUG)
+        self.chk_verbose.toggled.connect(self.set_verbose)
+
         # Initialize GUI components
         self.init_actuator_table()
         self.init_monitor_table()
@@ -143,13 +345,30 @@ class DiagnosticGUI(QWidget):
         self.dtc_table.setColumnCount(4)
         self.dtc_table.setHorizontalHeaderLabels(["Code", "Description", "Status", "Severity"])
         self.dtc_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        _configure_table(self.dtc_table)
 
         # Add About tab
         self.add_about_tab()
 
         # State variables
         self.monitor_thread = None
-        self.monitor_data = {}
+        self.monitor_data = MonitorSnapshot()
+
+        # Monitor data is only buffered as it arrives (_ingest); labels and
+        # curves are refreshed by this timer at a fixed ~30 Hz (_redraw)
+        self._redraw_timer = QTimer(self)
+        self._redraw_timer.setInterval(33)
+        self._redraw_timer.timeout.connect(self._redraw)
+        self._dirty = False
+        self.job_thread = None  # running UDSJobWorker, if any
+
+        # One UDS client for the whole session (connected on first use) instead
+        # of bringing the CAN link up and down for every action
+        self.uds = None
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def set_verbose(self, enabled):
+        logging.getLogger("uds").setLevel(logging.DEBUG if enabled else logging.WARNING)
 
     # ============================================================
     # About Tab (اطلاعات درباره نرم‌افزار)
@@ -158,9 +377,7 @@ class DiagnosticGUI(QWidget):
         about_tab = QWidget()
         layout = QVBoxLayout()
         logo_label = QLabel()
-        logo_label.setPixmap(
-            QtGui.QPixmap("./assets/logo.png").scaled(120, 120, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        )
+        logo_label.setPixmap(_logo_pixmap(120))
         logo_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(logo_label)
         credit = QLabel("Created by Sina Jahanbakhsh")
@@ -174,6 +391,7 @@ class DiagnosticGUI(QWidget):
     # راه‌اندازی جدول عملگرها
     # ============================================================
     def init_actuator_table(self):
+        _configure_table(self.actuator_table)
         self.actuator_table.setRowCount(len(ACTUATORS))
         for row, name in enumerate(ACTUATORS.keys()):
             self.actuator_table.setItem(row, 0, QTableWidgetItem(name))
@@ -184,116 +402,169 @@ class DiagnosticGUI(QWidget):
     # ایجاد لیبل‌ها برای نمایش داده‌های زنده
     # ============================================================
     def init_monitor_table(self):
-        # Each tuple = (Group, SignalKey, LabelText)
+        # Each tuple = (SnapshotField, ValveFlags bit or None, LabelText)
         self.signals = [
-            ("Diagnostic Session", None, "Diagnostic Session"),
-            ("Spare Part Number", None, "Spare Part Number"),
-            ("System Supplier ID", None, "System Supplier ID"),
-            ("Manufacturing Date", None, "Manufacturing Date"),
-            ("VIN", None, "VIN"),
-            ("Software Version", None, "Software Version"),
-            ("Hardware Version", None, "Hardware Version"),
+            ("session", None, "Diagnostic Session"),
+            ("spare_part", None, "Spare Part Number"),
+            ("supplier_id", None, "System Supplier ID"),
+            ("manufacturing_date", None, "Manufacturing Date"),
+            ("vin", None, "VIN"),
+            ("software_version", None, "Software Version"),
+            ("hardware_version", None, "Hardware Version"),
             # --- Speeds ---
-            ("Wheel Speeds + Vehicle Speed", "WheelFL_kmh", "Wheel Speed Front Left"),
-            ("Wheel Speeds + Vehicle Speed", "WheelFR_kmh", "Wheel Speed Front Right"),
-            ("Wheel Speeds + Vehicle Speed", "WheelRL_kmh", "Wheel Speed Rear Left"),
-            ("Wheel Speeds + Vehicle Speed", "WheelRR_kmh", "Wheel Speed Rear Right"),
-            ("Wheel Speeds + Vehicle Speed", "VehicleSpeed_kmh", "Vehicle Speed"),
+            ("wheel_fl", None, "Wheel Speed Front Left"),
+            ("wheel_fr", None, "Wheel Speed Front Right"),
+            ("wheel_rl", None, "Wheel Speed Rear Left"),
+            ("wheel_rr", None, "Wheel Speed Rear Right"),
+            ("vehicle_speed", None, "Vehicle Speed"),
             # --- Inputs ---
-            ("Input Data", "BatteryV", "Battery Voltage (V)"),
-            ("Input Data", "BrakeLight", "Brake Light Switch"),
+            ("battery_v", None, "Battery Voltage (V)"),
+            ("brake_light", None, "Brake Light Switch"),
             # --- Actuation State ---
-            ("Actuation State", "ValveRelay", "Valve Relay"),
-            ("Actuation State", "PumpMotor", "Pump Motor"),
-            ("Actuation State", "EVFL", "Inlet Valve Front Left"),
-            ("Actuation State", "AVFL", "Outlet Valve Front Left"),
-            ("Actuation State", "EVFR", "Inlet Valve Front Right"),
-            ("Actuation State", "AVFR", "Outlet Valve Front Right"),
-            ("Actuation State", "EVRL", "Inlet Valve Rear Left"),
-            ("Actuation State", "AVRL", "Outlet Valve Rear Left"),
-            ("Actuation State", "EVRR", "Inlet Valve Rear Right"),
-            ("Actuation State", "AVRR", "Outlet Valve Rear Right"),
-            ("Actuation State", "USV1", "Valve USV1"),
-            ("Actuation State", "USV2", "Valve USV2"),
-            ("Actuation State", "HSV1", "Valve HSV1"),
-            ("Actuation State", "HSV2", "Valve HSV2"),
+            ("valve_flags", ValveFlags.RELAY, "Valve Relay"),
+            ("valve_flags", ValveFlags.PUMP, "Pump Motor"),
+            ("valve_flags", ValveFlags.EVFL, "Inlet Valve Front Left"),
+            ("valve_flags", ValveFlags.AVFL, "Outlet Valve Front Left"),
+            ("valve_flags", ValveFlags.EVFR, "Inlet Valve Front Right"),
+            ("valve_flags", ValveFlags.AVFR, "Outlet Valve Front Right"),
+            ("valve_flags", ValveFlags.EVRL, "Inlet Valve Rear Left"),
+            ("valve_flags", ValveFlags.AVRL, "Outlet Valve Rear Left"),
+            ("valve_flags", ValveFlags.EVRR, "Inlet Valve Rear Right"),
+            ("valve_flags", ValveFlags.AVRR, "Outlet Valve Rear Right"),
+            ("valve_flags", ValveFlags.USV1, "Valve USV1"),
+            ("valve_flags", ValveFlags.USV2, "Valve USV2"),
+            ("valve_flags", ValveFlags.HSV1, "Valve HSV1"),
+            ("valve_flags", ValveFlags.HSV2, "Valve HSV2"),
             # --- Statuses ---
-            ("Filling-in Status", None, "Filling-in Status"),
-            ("EOL Status", None, "EOL Status"),
+            ("filling_status", None, "Filling-in Status"),
+            ("eol_status", None, "EOL Status"),
             # --- Sensors ---
-            ("System Sensors", "MasterCylinder_bar", "Master Cylinder Pressure (bar)"),
-            ("System Sensors", "Steering_deg", "Steering Angle (°)"),
-            ("System Sensors", "Yaw_rad_s", "Yaw Rate (rad/s)"),
-            ("System Sensors", "Lateral_m_s2", "Lateral Acceleration (m/s²)"),
-            ("System Sensors", "Longitudinal_m_s2", "Longitudinal Acceleration (m/s²)"),
+            ("master_cylinder", None, "Master Cylinder Pressure (bar)"),
+            ("steering", None, "Steering Angle (°)"),
+            ("yaw_rate", None, "Yaw Rate (rad/s)"),
+            ("lateral_accel", None, "Lateral Acceleration (m/s²)"),
+            ("longitudinal_accel", None, "Longitudinal Acceleration (m/s²)"),
             # --- Variant ---
-            ("Variant Code", None, "Variant Code"),
+            ("variant_code", None, "Variant Code"),
         ]
 
         # Create labels in grid layout (two per row)
         self.value_labels = {}
+        # Value and style code each label currently shows, per signal row
+        # ("N/A" == None)
+        self.shown_values = [None] * len(self.signals)
+        self.shown_styles = [_STYLE_DEFAULT] * len(self.signals)
         row, col = 0, 0
-        for group, signal, label in self.signals:
+        for field, bit, label in self.signals:
             lbl_name = QLabel(label)
             lbl_val = QLabel("N/A")
             lbl_val.setMinimumWidth(120)
-            lbl_val.setStyleSheet("padding: 2px; border: 1px solid lightgray;")
+            lbl_val.setStyleSheet(_STYLES[_STYLE_DEFAULT])
 
             self.grid_signals.addWidget(lbl_name, row, col * 2)
             self.grid_signals.addWidget(lbl_val, row, col * 2 + 1)
 
-            self.value_labels[(group, signal)] = lbl_val
+            self.value_labels[(field, bit)] = lbl_val
             col += 1
             if col >= 2:
                 col = 0
                 row += 1
 
+        # (value label, snapshot field, bit) per signal row, for update_monitor_table
+        self._label_rows = tuple(
+            (self.value_labels[(field, bit)], field, bit) for field, bit, _ in self.signals
+        )
+
     # ============================================================
     # Initialize PyQtGraph Live Plots
     # ============================================================
     def init_graphs(self):
         self.max_points = 200
-        self.time_axis = deque(maxlen=self.max_points)
 
         # --- Wheel Speeds Plot ---
         self.wheel_plot = pg.PlotWidget(title="Wheel Speeds (km/h)")
         self.wheel_plot.addLegend()
         self.graph_layout.addWidget(self.wheel_plot)
+        # Keyed by MonitorSnapshot field; invalid samples are NaN (gaps)
         self.curves_wheel = {
-            "WheelFL_kmh": self.wheel_plot.plot(pen='r', name="Front Left"),
-            "WheelFR_kmh": self.wheel_plot.plot(pen='g', name="Front Right"),
-            "WheelRL_kmh": self.wheel_plot.plot(pen='b', name="Rear Left"),
-            "WheelRR_kmh": self.wheel_plot.plot(pen='y', name="Rear Right"),
-            "VehicleSpeed_kmh": self.wheel_plot.plot(pen='w', name="Vehicle"),
+            "wheel_fl": self.wheel_plot.plot(pen='r', name="Front Left", connect="finite"),
+            "wheel_fr": self.wheel_plot.plot(pen='g', name="Front Right", connect="finite"),
+            "wheel_rl": self.wheel_plot.plot(pen='b', name="Rear Left", connect="finite"),
+            "wheel_rr": self.wheel_plot.plot(pen='y', name="Rear Right", connect="finite"),
+            "vehicle_speed": self.wheel_plot.plot(pen='w', name="Vehicle", connect="finite"),
         }
-        self.data_wheel = {k: deque(maxlen=self.max_points) for k in self.curves_wheel}
 
         # --- Sensors Plot ---
         self.sensor_plot = pg.PlotWidget(title="Sensors")
         self.sensor_plot.addLegend()
         self.graph_layout.addWidget(self.sensor_plot)
         self.curves_sensor = {
-            "Steering_deg": self.sensor_plot.plot(pen='c', name="Steering Angle"),
-            "Yaw_rad_s": self.sensor_plot.plot(pen='m', name="Yaw Rate"),
-            "Lateral_m_s2": self.sensor_plot.plot(pen='r', name="Lateral Accel"),
-            "Longitudinal_m_s2": self.sensor_plot.plot(pen='g', name="Longitudinal Accel"),
+            "steering": self.sensor_plot.plot(pen='c', name="Steering Angle", connect="finite"),
+            "yaw_rate": self.sensor_plot.plot(pen='m', name="Yaw Rate", connect="finite"),
+            "lateral_accel": self.sensor_plot.plot(pen='r', name="Lateral Accel", connect="finite"),
+            "longitudinal_accel": self.sensor_plot.plot(pen='g', name="Longitudinal Accel", connect="finite"),
         }
-        self.data_sensor = {k: deque(maxlen=self.max_points) for k in self.curves_sensor}
+
+        # Plot history is one preallocated ring matrix: a row per curve (in
+        # _plot_keys order) plus the sample times in the last row. _head is
+        # the next column to write, _count the number of valid samples
+        self._plot_keys = [*self.curves_wheel, *self.curves_sensor]
+        self._curves = [*self.curves_wheel.values(), *self.curves_sensor.values()]
+        self._ring = np.zeros((len(self._plot_keys) + 1, self.max_points))
+        self._head = 0
+        self._count = 0
+        self._blank = [False] * len(self._curves)  # curve shows no samples
+
+        # Draw at most one (peak-preserving) point per pixel, and only the
+        # visible part of each curve
+        for curve in self._curves:
+            curve.setDownsampling(auto=True, method="peak")
+            curve.setClipToView(True)
+
+    # --- Shared UDS Client ---
+    def _client(self):
+        """Return the shared UDS client, connecting it on first use."""
+        if self.uds is None:
+            self.uds = UDSClient(channel=CAN_INTERFACE)
+        return self.uds
+
+    def shutdown(self):
+        """Stop background work and release the CAN interface."""
+        self.stop_monitoring()
+        if self.job_thread:
+            self.job_thread.wait()
+        if self.uds:
+            self.uds.shutdown()
+            self.uds = None
+
+    # --- Background UDS Jobs ---
+    def _start_job(self, worker, on_result, on_failed=None):
+        """Start a UDS job worker unless another one is still running."""
+        if self.job_thread and self.job_thread.isRunning():
+            return False
+        try:
+            worker.uds = self._client()
+        except Exception as e:
+            (on_failed or self._show_job_error)(str(e))
+            return False
+        worker.result.connect(on_result)
+        worker.failed.connect(on_failed or self._show_job_error)
+        self.job_thread = worker
+        worker.start()
+        return True
+
+    def _show_job_error(self, message):
+        QMessageBox.warning(self, "UDS Error", message)
 
     # --- Actuator Functions ---
     def run_actuator_on(self):
-        uds = UDSClient(channel=CAN_INTERFACE)
-        try:
-            uds.enter_extended_session()
-            uds.security_access()
-            actuator_id = self.actuator_select.currentData()
-            uds.actuator_test(actuator_id, on=True, time_ms=1000)
-            time.sleep(1.2)
-            uds.actuator_test(actuator_id, on=False, time_ms=1000)
-        finally:
-            uds.shutdown()
+        actuator_id = self.actuator_select.currentData()
+        self._start_job(UDSJobWorker(lambda uds: _pulse_actuator(uds, actuator_id)), lambda _: None)
 
     def run_all_actuators(self):
+        if self.job_thread and self.job_thread.isRunning():
+            return
+
         # Remove summary row if it exists
         current_row_count = self.actuator_table.rowCount()
         if current_row_count > len(ACTUATORS):
@@ -301,155 +572,185 @@ class DiagnosticGUI(QWidget):
             if last_item and "EOL Actuator Test" in last_item.text():
                 self.actuator_table.removeRow(current_row_count - 1)
 
-        QApplication.processEvents()
-
-        # Clear previous status messages
-        self.actuator_table.setRowCount(len(ACTUATORS))
-        for row in range(self.actuator_table.rowCount()):
-            empty_item = QTableWidgetItem("")
-            empty_item.setTextAlignment(Qt.AlignCenter)
-            self.actuator_table.setItem(row, 1, empty_item)
-
-        QApplication.processEvents()
-
-        uds = UDSClient(channel=CAN_INTERFACE)
-        all_passed = True
+        # Clear previous status messages (one repaint for the whole column)
+        table = self.actuator_table
+        table.setUpdatesEnabled(False)
+        table.blockSignals(True)
         try:
-            uds.enter_extended_session()
-            uds.security_access()
-            for row, (name, aid) in enumerate(ACTUATORS.items()):
-                resp = uds.actuator_test(aid, on=True, time_ms=1000)
-                time.sleep(1.2)
-                uds.actuator_test(aid, on=False, time_ms=1000)
-                time.sleep(0.2)
-
-                status_text = "✅ Success" if resp else "❌ Fail"
-                status_item = QTableWidgetItem(status_text)
-                status_item.setTextAlignment(Qt.AlignCenter)
-
-                color = QColor(200, 255, 200) if resp else QColor(255, 200, 200)
-                status_item.setBackground(QBrush(color))
-
-                self.actuator_table.setItem(row, 1, status_item)
-                QApplication.processEvents()
-
-                if not resp:
-                    all_passed = False
-
-            # Add final summary row
-            final_row = self.actuator_table.rowCount()
-            self.actuator_table.insertRow(final_row)
-            if all_passed:
-                message = "✅ EOL Actuator Test has been successfully passed"
-                bg_color = QColor(200, 255, 200)
-            else:
-                message = "❌ EOL Actuator Test failed — check individual actuators"
-                bg_color = QColor(255, 200, 200)
-            summary_item = QTableWidgetItem(message)
-            summary_item.setTextAlignment(Qt.AlignCenter)
-            summary_item.setBackground(QBrush(bg_color))
-
-            # Make text bold and 3x larger
-            font = QFont()
-            font.setBold(True)
-            font.setPointSize(font.pointSize() * 2)  # Triple the default font size
-            summary_item.setFont(font)
-
-            # Insert and style the row
-            self.actuator_table.insertRow(self.actuator_table.rowCount())  # Add new row at the end
-            final_row = self.actuator_table.rowCount() - 1  # Now get the correct index
-
-            self.actuator_table.setSpan(final_row, 0, 1, self.actuator_table.columnCount())
-            self.actuator_table.setItem(final_row, 0, summary_item)
-
-            # Double the row height
-            default_height = self.actuator_table.rowHeight(0)
-            self.actuator_table.setRowHeight(final_row, default_height * 2)
-
+            table.setRowCount(len(ACTUATORS))
+            for row in range(table.rowCount()):
+                empty_item = QTableWidgetItem("")
+                empty_item.setTextAlignment(Qt.AlignCenter)
+                table.setItem(row, 1, empty_item)
         finally:
-            uds.shutdown()
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
+
+        worker = ActuatorSweepWorker()
+        worker.progress.connect(self._on_actuator_progress)
+        self._start_job(worker, self._on_actuator_sweep_done)
+
+    def _on_actuator_progress(self, row, name, passed):
+        status_text = "✅ Success" if passed else "❌ Fail"
+        status_item = QTableWidgetItem(status_text)
+        status_item.setTextAlignment(Qt.AlignCenter)
+        status_item.setBackground(self._BRUSH_OK if passed else self._BRUSH_FAIL)
+
+        self.actuator_table.setItem(row, 1, status_item)
+
+    def _on_actuator_sweep_done(self, all_passed):
+        # Add final summary row
+        final_row = self.actuator_table.rowCount()
+        self.actuator_table.insertRow(final_row)
+        if all_passed:
+            message = "✅ EOL Actuator Test has been successfully passed"
+            brush = self._BRUSH_OK
+        else:
+            message = "❌ EOL Actuator Test failed — check individual actuators"
+            brush = self._BRUSH_FAIL
+        summary_item = QTableWidgetItem(message)
+        summary_item.setTextAlignment(Qt.AlignCenter)
+        summary_item.setBackground(brush)
+
+        # Make text bold and larger
+        summary_item.setFont(self._summary_font)
+
+        # Insert and style the row
+        self.actuator_table.insertRow(self.actuator_table.rowCount())  # Add new row at the end
+        final_row = self.actuator_table.rowCount() - 1  # Now get the correct index
+
+        self.actuator_table.setSpan(final_row, 0, 1, self.actuator_table.columnCount())
+        self.actuator_table.setItem(final_row, 0, summary_item)
+
+        # Double the row height
+        default_height = self.actuator_table.rowHeight(0)
+        self.actuator_table.setRowHeight(final_row, default_height * 2)
 
     # --- Monitoring ---
     def start_monitoring(self):
         if self.monitor_thread and self.monitor_thread.isRunning():
             return
-        self.monitor_thread = MonitorWorker(channel=CAN_INTERFACE)
-        self.monitor_thread.data_signal.connect(self.update_monitor_table)
+        try:
+            uds = self._client()
+        except Exception as e:
+            self._show_job_error(str(e))
+            return
+        self.monitor_thread = MonitorWorker(uds)
+        self.monitor_thread.data_signal.connect(self._ingest)
         self.monitor_thread.start()
+        self._redraw_timer.start()
 
     def stop_monitoring(self):
         if self.monitor_thread:
             self.monitor_thread.stop()
             self.monitor_thread = None
-
-    def update_monitor_table(self, data: dict):
-        self.monitor_data = data
-        t = time.time()
-        self.time_axis.append(t)
-
-        for group, signal, _ in self.signals:
-            decoded = data.get(group, None)
-            value_str = "N/A"
-            if isinstance(decoded, dict) and signal and signal in decoded:
-                value_str = decoded[signal]
-            elif decoded is not None and signal is None:
-                value_str = decoded
+        self._redraw_timer.stop()
+        self._redraw()  # show whatever arrived since the last tick
+
+    def _ingest(self, snapshot: MonitorSnapshot):
+        """Store a new snapshot and append it to the plot buffers (no Qt calls)."""
+        self.monitor_data = snapshot
+
+        # Missing values are plotted as gaps
+        head = self._head
+        column = self._ring[:, head]
+        for row, key in enumerate(self._plot_keys):
+            value = getattr(snapshot, key)
+            column[row] = np.nan if value is None else value
+        column[-1] = time.time()
+        self._head = (head + 1) % self.max_points
+        self._count = min(self._count + 1, self.max_points)
+        self._dirty = True
+
+    def _redraw(self):
+        """Timer tick: refresh labels and curves if new data has arrived."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        self.update_monitor_table(self.monitor_data)
+
+        history = self._ordered()
+        x = history[-1]
+        # A curve with no valid samples draws nothing; if it was already
+        # blank there is nothing to update
+        blank = np.isnan(history[:-1]).all(axis=1).tolist()
+        for row, (curve, y) in enumerate(zip(self._curves, history)):
+            if blank[row] and self._blank[row]:
+                continue
+            self._blank[row] = blank[row]
+            curve.setData(x, y)
+
+    def update_monitor_table(self, snapshot: MonitorSnapshot):
+        for row, (lbl, field, bit) in enumerate(self._label_rows):
+            value = getattr(snapshot, field)
+            if bit is not None and value is not None:
+                value = bool(value & bit)
+
+            # Leave the label alone if it already shows this value
+            if value == self.shown_values[row]:
+                continue
+            self.shown_values[row] = value
+
+            value_str = "N/A" if value is None else value
 
             if isinstance(value_str, bool):
                 value_str = "ON" if value_str else "OFF"
 
-            lbl = self.value_labels.get((group, signal))
-            if lbl:
-                lbl.setText(str(value_str))
-                if str(value_str).upper() in ("ON", "1", "TRUE"):
-                    lbl.setStyleSheet("background-color: lightgreen; padding: 2px;")
-                elif str(value_str).upper() in ("OFF", "0", "FALSE"):
-                    lbl.setStyleSheet("background-color: pink; padding: 2px;")
-                else:
-                    lbl.setStyleSheet("padding: 2px; border: 1px solid lightgray;")
-
-        # Update graphs
-        wheels = data.get("Wheel Speeds + Vehicle Speed", {})
-        for key, curve in self.curves_wheel.items():
-            if isinstance(wheels, dict) and key in wheels:
-                self.data_wheel[key].append(float(wheels[key]))
-                curve.setData(list(self.time_axis), list(self.data_wheel[key]))
-
-        sensors = data.get("System Sensors", {})
-        for key, curve in self.curves_sensor.items():
-            if isinstance(sensors, dict) and key in sensors:
-                self.data_sensor[key].append(float(sensors[key]))
-                curve.setData(list(self.time_axis), list(self.data_sensor[key]))
+            text = str(value_str)
+            lbl.setText(text)
+            upper = text.upper()
+            if upper in _ON_TEXT:
+                style = _STYLE_ON
+            elif upper in _OFF_TEXT:
+                style = _STYLE_OFF
+            else:
+                style = _STYLE_DEFAULT
+            # Restyling is expensive; only do it when the style changes
+            if style != self.shown_styles[row]:
+                self.shown_styles[row] = style
+                lbl.setStyleSheet(_STYLES[style])
+
+    def _ordered(self):
+        """Plot history (rows of the ring matrix), oldest sample first."""
+        if self._count < self.max_points:
+            return self._ring[:, :self._count]  # not wrapped yet; later writes go past this view
+        # Full: unroll into a new array, since the ring is overwritten in place
+        return np.concatenate((self._ring[:, self._head:], self._ring[:, :self._head]), axis=1)
 
     def read_dtcs(self):
-        uds = UDSClient(channel=CAN_INTERFACE)
+        self._start_job(UDSJobWorker(lambda uds: uds.read_dtcs()), self._show_dtcs)
+
+    def _show_dtcs(self, dtcs):
+        # Fill with repaints and item signals suspended: one repaint at the end
+        table = self.dtc_table
+        table.setUpdatesEnabled(False)
+        table.blockSignals(True)
         try:
-            uds.enter_extended_session()
-            uds.security_access()
-            dtcs = uds.read_dtcs()
-            self.dtc_table.setRowCount(len(dtcs))
+            table.setRowCount(len(dtcs))
             for row, d in enumerate(dtcs):
-                self.dtc_table.setItem(row, 0, QTableWidgetItem(d["code"]))
-                self.dtc_table.setItem(row, 1, QTableWidgetItem(d["desc"]))
-                self.dtc_table.setItem(row, 2, QTableWidgetItem(d["status"]))
-                self.dtc_table.setItem(row, 3, QTableWidgetItem(d["severity"]))
+                for col, key in enumerate(("code", "desc", "status", "severity")):
+                    table.setItem(row, col, QTableWidgetItem(d[key]))
         finally:
-            uds.shutdown()
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
 
     def clear_dtcs(self):
-        uds = UDSClient(channel=CAN_INTERFACE)
-        try:
-            uds.enter_extended_session()
-            uds.security_access()
-            if uds.clear_dtcs():
-                self.dtc_table.setRowCount(0)
-        finally:
-            uds.shutdown()
+        self._start_job(UDSJobWorker(lambda uds: uds.clear_dtcs()), self._on_dtcs_cleared)
+
+    def _on_dtcs_cleared(self, cleared):
+        if cleared:
+            self.dtc_table.setRowCount(0)
 
     def _run_calibration_routine(self, routine_name: str, routine_attr_name: str):
         lbl = getattr(self, "lbl_cal_status", None)
         bar = getattr(self, "progress_calibration", None)
 
+        worker = UDSJobWorker(lambda uds: getattr(uds, routine_attr_name)())
+        if not self._start_job(worker,
+                               partial(self._show_calibration_result, routine_name),
+                               partial(self._show_calibration_error, routine_name)):
+            return
+
         if lbl:
             lbl.setText(f"➡️ Starting {routine_name}...")
         if bar:
@@ -457,47 +758,42 @@ class DiagnosticGUI(QWidget):
             bar.setFormat("Running...")
             bar.setStyleSheet("QProgressBar::chunk { background-color: lightblue; }")
 
-        uds = UDSClient(channel=CAN_INTERFACE)
-        try:
-            uds.enter_extended_session()
-            uds.security_access()
-            func = getattr(uds, routine_attr_name)
-
-            # Run the routine (this usually completes in <1s)
-            resp = func()
-
-            if resp and len(resp) >= 3 and resp[0] == 0x71:
-                msg = f"✅ {routine_name}: OK (resp: {resp.hex()})"
-                if bar:
-                    bar.setStyleSheet("QProgressBar::chunk { background-color: lightgreen; }")
-                    bar.setValue(100)
-                    bar.setFormat("Completed ✓")
-            elif resp and resp[0] == 0x7F:
-                nrc = resp[2] if len(resp) > 2 else None
-                msg = f"❌ {routine_name}: Negative Response (NRC=0x{nrc:02X})"
-                if bar:
-                    bar.setStyleSheet("QProgressBar::chunk { background-color: lightcoral; }")
-                    bar.setValue(100)
-                    bar.setFormat("Failed ✗")
-            else:
-                msg = f"ℹ️ {routine_name}: Unknown Response {resp}"
-
-            if lbl:
-                lbl.setText(msg)
+    def _show_calibration_result(self, routine_name, resp):
+        lbl = getattr(self, "lbl_cal_status", None)
+        bar = getattr(self, "progress_calibration", None)
 
-            # Animate progress bar for 10 seconds while calibration runs
+        if resp and len(resp) >= 3 and resp[0] == 0x71:
+            msg = f"✅ {routine_name}: OK (resp: {resp.hex()})"
             if bar:
-                self._animate_progress_bar(bar, duration_ms=10000)
-
-        except Exception as e:
-            if lbl:
-                lbl.setText(f"❌ {routine_name}: {e}")
+                bar.setStyleSheet("QProgressBar::chunk { background-color: lightgreen; }")
+                bar.setValue(100)
+                bar.setFormat("Completed ✓")
+        elif resp and resp[0] == 0x7F:
+            nrc = BYTE_HEX[resp[2]] if len(resp) > 2 else "??"
+            msg = f"❌ {routine_name}: Negative Response (NRC=0x{nrc})"
             if bar:
                 bar.setStyleSheet("QProgressBar::chunk { background-color: lightcoral; }")
                 bar.setValue(100)
-                bar.setFormat("Error ✗")
-        finally:
-            uds.shutdown()
+                bar.setFormat("Failed ✗")
+        else:
+            msg = f"ℹ️ {routine_name}: Unknown Response {resp}"
+
+        if lbl:
+            lbl.setText(msg)
+
+        # Animate progress bar for 10 seconds while calibration runs
+        if bar:
+            self._animate_progress_bar(bar, duration_ms=10000)
+
+    def _show_calibration_error(self, routine_name, message):
+        lbl = getattr(self, "lbl_cal_status", None)
+        bar = getattr(self, "progress_calibration", None)
+        if lbl:
+            lbl.setText(f"❌ {routine_name}: {message}")
+        if bar:
+            bar.setStyleSheet("QProgressBar::chunk { background-color: lightcoral; }")
+            bar.setValue(100)
+            bar.setFormat("Error ✗")
 
     def _animate_progress_bar(self, bar, duration_ms=10000):
         """Animate calibration progress bar for given duration"""
@@ -518,15 +814,16 @@ class DiagnosticGUI(QWidget):
 
     def on_start_sas_cal(self):
         """Handler for Start SAS Calibration button"""
-        self._run_calibration_routine("SAS Calibration (F105)", lambda: UDSClient(channel=CAN_INTERFACE).start_sas_calibration())
+        self._run_calibration_routine("SAS Calibration (F105)", "start_sas_calibration")
 
     def on_start_yaw_cal(self):
         """Handler for Start Yaw Rate Calibration button"""
-        self._run_calibration_routine("Yaw Rate Calibration (F106)", lambda: UDSClient(channel=CAN_INTERFACE).start_yaw_calibration())
+        self._run_calibration_routine("Yaw Rate Calibration (F106)", "start_yaw_calibration")
 
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
     app = QApplication(sys.argv)
     gui = DiagnosticGUI()
     gui.show()
@@ -12,13 +12,23 @@
 #   شامل ورود به سشن، دسترسی امنیتی، کنترل روتین‌ها، خطاها و تست عملگرها.
 # ============================================================
 
+import logging
+import struct
 import time
+import threading
 import can
 import isotp
+import numpy as np
 from dtc_codes import DTC_MAP, decode_status
 from can_control import bring_up, bring_down
-from utils import print_request, print_response
-from decoders import decode_value  # ← new external decoder module
+from utils import BYTE_HEX, print_request, print_response
+from decoders import decode_value, DID_LENGTHS  # ← new external decoder module
+
+_log = logging.getLogger("uds")
+
+# Expected SecurityAccess seed/key widths: packer and key mask per byte count
+_SEED_FORMATS = {n: (struct.Struct(fmt), (1 << (8 * n)) - 1)
+                 for n, fmt in ((2, ">H"), (4, ">I"), (8, ">Q"))}
 
 
 class UDSClient:
@@ -30,8 +40,17 @@ class UDSClient:
         self.rxid = rxid
         self.bitrate = bitrate
         self.bus = None
+        self.notifier = None
         self.stack = None
         self.timeout = 2.0
+        self.multi_did = True  # cleared if the ECU rejects multi-DID reads
+        # One client is shared by the GUI's worker threads: requests are
+        # serialized, and the session state is tracked for ensure_session()
+        self._lock = threading.RLock()
+        self.unlocked = False
+        self._last_activity = 0.0
+        # Actuator test request template, only the variable bytes are patched per call
+        self._actuator_tpl = bytearray(b"\x31\x01\xF0\x03" + b"\x00" * 18)
         self.connect()
 
     # ------------------------------------------------------------
@@ -43,7 +62,11 @@ class UDSClient:
         self.bus = can.interface.Bus(channel=self.channel, interface="socketcan")
         addr = isotp.Address(isotp.AddressingMode.Normal_11bits,
                              txid=self.txid, rxid=self.rxid)
-        self.stack = isotp.CanStack(bus=self.bus, address=addr)
+        # Frames are dispatched by a can.Notifier thread, so send_request can
+        # block in recv() instead of polling the stack
+        self.notifier = can.Notifier(self.bus, [])
+        self.stack = isotp.NotifierBasedCanStack(bus=self.bus, notifier=self.notifier,
+                                                 address=addr)
         try:
             self.stack.set_fc_opts(stmin=0.01, bs=8)
         except Exception:
@@ -53,6 +76,7 @@ class UDSClient:
             except Exception:
                 pass
         self.stack.padding = 0x00
+        self.stack.start()
 
     def shutdown(self):
         """Close CAN and ISO-TP interfaces."""
@@ -61,6 +85,11 @@ class UDSClient:
                 self.stack.stop()
             except Exception:
                 pass
+        if self.notifier:
+            try:
+                self.notifier.stop()
+            except Exception:
+                pass
         if self.bus:
             try:
                 self.bus.shutdown()
@@ -75,31 +104,40 @@ class UDSClient:
         """Send a UDS request and wait for response, handle 0x78 pending."""
         if timeout is None:
             timeout = self.timeout
+        with self._lock:
+            return self._transact(label, payload, timeout)
+
+    def _transact(self, label, payload, timeout):
         print_request(label, payload)
         self.stack.send(payload)
 
-        start = time.time()
+        deadline = time.monotonic() + timeout
         pending = False
+        sid = payload[0]
 
         while True:
-            self.stack.process()
-            if self.stack.available():
-                resp = self.stack.recv()
-                print_response(label, resp)
-
-                # Handle NRC 0x78 (Response Pending)
-                if resp and len(resp) >= 3 and resp[0] == 0x7F and resp[2] == 0x78:
-                    if not pending:
-                        print("⏳ ای‌سی‌یو پاسخ در حال پردازش است...")
-                        pending = True
-                    start = time.time()
-                    continue
-                return resp
-
-            if time.time() - start > timeout:
-                print(f"⏱️ Timeout waiting for {label}")
+            resp = self.stack.recv(block=True, timeout=max(0.0, deadline - time.monotonic()))
+            if resp is None:
+                _log.warning("⏱️ Timeout waiting for %s", label)
                 return None
-            time.sleep(0.005)
+            print_response(label, resp)
+
+            # The stack is shared: a late reply to an earlier (timed-out)
+            # request may still be queued. Only accept replies to this SID.
+            if not resp or not (resp[0] == sid + 0x40
+                                or (resp[0] == 0x7F and len(resp) >= 2 and resp[1] == sid)):
+                _log.debug("Ignoring unrelated response to %s: %s", label, resp.hex())
+                continue
+
+            # Handle NRC 0x78 (Response Pending)
+            if len(resp) >= 3 and resp[0] == 0x7F and resp[2] == 0x78:
+                if not pending:
+                    _log.debug("⏳ ای‌سی‌یو پاسخ در حال پردازش است...")
+                    pending = True
+                deadline = time.monotonic() + timeout
+                continue
+            self._last_activity = time.monotonic()
+            return resp
 
     # ------------------------------------------------------------
     # Session & Security
@@ -116,33 +154,54 @@ class UDSClient:
         """
         resp = self.send_request("SecurityAccess - RequestSeed", b"\x27\x01")
         if not resp or resp[0:2] != b"\x67\x01":
-            print("❌ خطا در دریافت Seed از ای‌سی‌یو")
+            _log.warning("❌ خطا در دریافت Seed از ای‌سی‌یو")
             return False
 
-        seed = int.from_bytes(resp[2:], "big")
         seed_bytes = len(resp) - 2
-        print(f"🔑 Received Seed ({seed_bytes} bytes): 0x{seed:0{seed_bytes*2}X}")
+        fmt = _SEED_FORMATS.get(seed_bytes)
+        if fmt is not None:
+            packer, mask = fmt
+            seed = packer.unpack_from(resp, 2)[0]
+        else:
+            _log.warning("⚠️ Unexpected seed length: %d bytes", seed_bytes)
+            seed = int.from_bytes(resp[2:], "big")
+            mask = (1 << (8 * seed_bytes)) - 1
+        _log.debug("🔑 Received Seed (%d bytes): 0x%0*X", seed_bytes, seed_bytes * 2, seed)
 
         # Key calculation (simple XOR-shift mask)
         raw_key = ((((seed >> 2) ^ seed) << 3) ^ seed)
-        mask = (1 << (8 * seed_bytes)) - 1
         key = raw_key & mask
 
-        print(f"🔑 Computed Key (masked): 0x{key:0{seed_bytes*2}X}")
-        payload = b"\x27\x02" + key.to_bytes(seed_bytes, "big")
+        _log.debug("🔑 Computed Key (masked): 0x%0*X", seed_bytes * 2, key)
+        if fmt is not None:
+            payload = b"\x27\x02" + packer.pack(key)
+        else:
+            payload = b"\x27\x02" + key.to_bytes(seed_bytes, "big")
 
         resp2 = self.send_request("SecurityAccess - SendKey", payload)
         if resp2 and resp2[:2] == b"\x67\x02":
-            print("✅ دسترسی امنیتی موفق بود")
+            _log.info("✅ دسترسی امنیتی موفق بود")
             return True
 
-        print("❌ Security Access Failed")
+        _log.warning("❌ Security Access Failed")
         return False
 
     def tester_present(self):
         """Keep session alive."""
         self.send_request("TesterPresent", b"\x3E\x00", timeout=0.6)
 
+    def ensure_session(self, max_idle=2.0):
+        """
+        Make sure the extended session is open and unlocked. The session is
+        only re-entered (with a new security handshake) if it was never
+        unlocked or the ECU has been idle for longer than `max_idle` seconds.
+        """
+        with self._lock:
+            if self.unlocked and time.monotonic() - self._last_activity <= max_idle:
+                return True
+            self.unlocked = self.enter_extended_session() and self.security_access()
+            return self.unlocked
+
     # ------------------------------------------------------------
     # RoutineControl (0x31)
     # ------------------------------------------------------------
@@ -150,7 +209,13 @@ class UDSClient:
         """Generic RoutineControl command."""
         if timeout is None:
             timeout = self.timeout
-        payload = bytes([0x31, control_option]) + routine_id.to_bytes(2, "big") + params
+        # 31 | option | routine ID (2) | params, assembled in one buffer
+        payload = bytearray(4 + len(params))
+        payload[0] = 0x31
+        payload[1] = control_option
+        payload[2] = routine_id >> 8
+        payload[3] = routine_id & 0xFF
+        payload[4:] = params
         return self.send_request(
             f"RoutineControl 0x{routine_id:04X} (opt={control_option:02X})", payload, timeout=timeout
         )
@@ -172,19 +237,17 @@ class UDSClient:
     # ------------------------------------------------------------
     def actuator_test(self, actuator_id, on=True, time_ms=1000):
         """Perform actuator test for given ID."""
-        actuator_value = b"\xFF\xFF" if on else b"\x00\x00"
-        time_val = int(time_ms / 10).to_bytes(2, "big")
-        payload = (
-            b"\x31\x01\xF0\x03" +
-            actuator_value + actuator_id.to_bytes(2, "big") +
-            b"\x00\x00\x00\x00" + time_val +
-            b"\x00" * 8
-        )
-        resp = self.send_request(f"ActuatorTest 0x{actuator_id:04X}", payload)
+        # 31 01 F003 | on/off (2) | actuator ID (2) | 00000000 | time/10ms (2) | 00 x 8
+        with self._lock:
+            tpl = self._actuator_tpl
+            tpl[4:6] = b"\xFF\xFF" if on else b"\x00\x00"
+            tpl[6:8] = actuator_id.to_bytes(2, "big")
+            tpl[12:14] = int(time_ms / 10).to_bytes(2, "big")
+            resp = self.send_request(f"ActuatorTest 0x{actuator_id:04X}", bytes(tpl))
         if resp and resp[:2] == b"\x71\x01":
-            print("✅ تست عملگر موفق بود")
+            _log.info("✅ تست عملگر موفق بود")
         elif resp and resp[0] == 0x7F:
-            print("❌ خطای پاسخ منفی از ای‌سی‌یو")
+            _log.warning("❌ خطای پاسخ منفی از ای‌سی‌یو")
         return resp
 
     # ------------------------------------------------------------
@@ -194,27 +257,45 @@ class UDSClient:
         """Read stored Diagnostic Trouble Codes (خواندن کدهای خطا)."""
         dtcs, seen = [], set()
 
-        for mask in [b"\x04", b"\x01"]:
-            print(f"➡️ Sending ReadDTCInformation: 1902{mask.hex()}")
+        # One request for every status (FF), keeping only pending (0x04) or
+        # testFailed (0x01) DTCs. If the ECU rejects FF, the two masks are
+        # requested separately instead (appended to the list being iterated).
+        masks = [b"\xFF"]
+        for mask in masks:
+            _log.debug("➡️ Sending ReadDTCInformation: 1902%s", mask.hex())
             resp = self.send_request("ReadDTCInformation", b"\x19\x02" + mask, timeout=5.0)
 
-            if not resp or resp[0] != 0x59:
-                print("❌ پاسخ نامعتبر برای DTC")
+            if (mask == b"\xFF" and resp and len(resp) >= 3
+                    and resp[0] == 0x7F and resp[2] in (0x12, 0x31)):
+                masks += [b"\x04", b"\x01"]
                 continue
 
-            payload = resp[3:]
-            for i in range(0, len(payload), 4):
-                if i + 4 > len(payload):
-                    break
-                code_bytes = payload[i:i + 3]
-                status = payload[i + 3]
-                dtc_val = int.from_bytes(code_bytes, "big")
+            if not resp or resp[0] != 0x59 or len(resp) < 3:
+                _log.warning("❌ پاسخ نامعتبر برای DTC")
+                continue
 
+            # Records are 3-byte DTC + 1 status byte; a trailing partial record is dropped
+            count = (len(resp) - 3) // 4
+            records = np.frombuffer(resp, dtype=np.uint8, count=count * 4, offset=3).reshape(-1, 4)
+            if mask == b"\xFF":
+                records = records[(records[:, 3] & 0x05) != 0]
+            codes = records[:, :3].astype(np.uint32)
+            dtc_vals = (codes[:, 0] << 16) | (codes[:, 1] << 8) | codes[:, 2]
+
+            # First occurrence of each DTC, in response order
+            _, keep = np.unique(dtc_vals, return_index=True)
+            keep.sort()
+
+            # Plain Python ints from here on (no numpy scalar indexing per DTC)
+            rows, dtc_vals = records.tolist(), dtc_vals.tolist()
+            for i in keep.tolist():
+                dtc_val = dtc_vals[i]
                 if dtc_val in seen:
                     continue
                 seen.add(dtc_val)
 
-                dtc_code = f"{code_bytes[0]:02X}{code_bytes[1]:02X}{code_bytes[2]:02X}"
+                b0, b1, b2, status = rows[i]
+                dtc_code = BYTE_HEX[b0] + BYTE_HEX[b1] + BYTE_HEX[b2]
                 desc = DTC_MAP.get(dtc_val, f"DTC {dtc_code}")
                 decoded = decode_status(status)
 
@@ -235,9 +316,89 @@ class UDSClient:
     # ------------------------------------------------------------
     # ReadDataByIdentifier (0x22)
     # ------------------------------------------------------------
-    def read_data_by_identifier(self, did):
-        """Read data by DID (خواندن داده با شناسه)."""
-        return self.send_request(f"ReadDataByIdentifier {hex(did)}", b"\x22" + did.to_bytes(2, "big"))
+    def read_data_by_identifier(self, did, into=None):
+        """
+        Read data by DID (خواندن داده با شناسه).
+        If a writable buffer is given as `into`, the response is copied into
+        it and a memoryview of that copy is returned.
+        """
+        resp = self.send_request(f"ReadDataByIdentifier {hex(did)}", bytes((0x22, did >> 8, did & 0xFF)))
+        return self._store(into, resp)[0]
+
+    def read_multi(self, dids, into=None):
+        """
+        Read several DIDs with a single request (22 DID1 DID2 ...).
+        Returns {did: response}, each record re-framed as a single-DID
+        response (62 DID data) so it can be passed to decode_value.
+        Falls back to one request per DID if the combined response cannot be
+        split; if the ECU rejects the combined request (NRC), per-DID reads
+        are used from then on. If the combined request times out, every DID
+        is returned as None for this call.
+        If a writable buffer is given as `into`, the responses are packed
+        into it and returned as memoryviews (valid until the next call).
+
+        خواندن چند شناسه با یک درخواست
+        """
+        records, free = {}, into
+        if self.multi_did and len(dids) > 1:
+            payload = struct.pack(f">B{len(dids)}H", 0x22, *dids)
+            resp = self.send_request(f"ReadDataByIdentifier {len(dids)} DIDs", payload)
+            if resp is None:
+                # No answer is not a rejection: don't spend a timeout per DID
+                return dict.fromkeys(dids)
+            if resp[0] == 0x7F:
+                self.multi_did = False
+                _log.info("ℹ️ Multi-DID read not supported, reading DIDs one by one")
+            else:
+                spans = self._split_multi(dids, resp)
+                if spans is not None:
+                    view = memoryview(resp)
+                    for did, start, end in spans:
+                        records[did], free = self._store(free, b"\x62", view[start:end])
+                    return records
+
+        for did in dids:
+            records[did], free = self._store(free, self.read_data_by_identifier(did))
+        return records
+
+    @staticmethod
+    def _split_multi(dids, resp):
+        """
+        Locate each DID record (DID + data) in a positive multi-DID response.
+        Returns [(did, start, end), ...], or None if it cannot be split.
+        """
+        if resp[0] != 0x62:
+            return None
+        spans, pos = [], 1
+        for did in dids:
+            length = DID_LENGTHS.get(did)
+            if length is None or int.from_bytes(resp[pos:pos + 2], "big") != did:
+                return None
+            end = pos + 2 + length
+            if end > len(resp):
+                return None
+            spans.append((did, pos, end))
+            pos = end
+        return spans if pos == len(resp) else None
+
+    @staticmethod
+    def _store(free, *parts):
+        """
+        Copy `parts` back to back into the writable buffer `free`.
+        Returns (memoryview of the copy, remaining free space). Without a
+        buffer, or if it is too small, the parts are returned as bytes.
+        """
+        if parts[-1] is None:
+            return None, free
+        size = sum(len(part) for part in parts)
+        if free is None or size > len(free):
+            return (parts[0] if len(parts) == 1 else b"".join(parts)), free
+        free = memoryview(free)
+        pos = 0
+        for part in parts:
+            free[pos:pos + len(part)] = part
+            pos += len(part)
+        return free[:size], free[size:]
 
     def decode_value(self, did, data):
         """Delegate decoding to external decoder module."""
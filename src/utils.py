@@ -1,15 +1,24 @@
 # utils.py
-import binascii
+import logging
+
+_log = logging.getLogger("uds")
+
+# Two-digit upper-case hex of every byte value (BYTE_HEX[0x7F] == "7F")
+BYTE_HEX = tuple(f"{i:02X}" for i in range(256))
 
 def hexdump(data: bytes) -> str:
-    """Convert bytes to hex string for display."""
-    return binascii.hexlify(data).decode()
+    """Convert bytes to hex string for display (e.g. "62 FD 00")."""
+    return data.hex(" ").upper()
 
 def print_request(label, payload: bytes):
-    print(f"\n➡️ Sending {label}: {hexdump(payload)}")
+    # Skip the hex formatting entirely unless debug logging is on
+    if _log.isEnabledFor(logging.DEBUG):
+        _log.debug("➡️ Sending %s: %s", label, hexdump(payload))
 
 def print_response(label, resp: bytes):
+    if not _log.isEnabledFor(logging.DEBUG):
+        return
     if resp is None:
-        print(f"⬅️ {label} Response: None")
+        _log.debug("⬅️ %s Response: None", label)
     else:
-        print(f"⬅️ {label} Response: {hexdump(resp)}")
+        _log.debug("⬅️ %s Response: %s", label, hexdump(resp))